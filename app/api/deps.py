@@ -1,22 +1,20 @@
 """
 API dependencies and shared utilities.
 """
-from typing import Generator, Optional, Union
+from typing import AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.models.user import User
+from app.middleware.auth_middleware import (
+    AuthContext,
+    resolve_credentials,
+    resolve_service_credentials,
+)
 from app.models.api_key import ApiKey
-from app.services.auth_service import AuthService, ApiKeyService
+from app.services.auth_service import CachedUser
 
 
-# Security scheme
-security = HTTPBearer(auto_error=False)
-
-
-def get_database() -> Generator:
+def get_database() -> AsyncGenerator:
     """
     Database session dependency.
     """
@@ -24,54 +22,30 @@ def get_database() -> Generator:
 
 
 async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
-) -> Optional[User]:
+    context: AuthContext = Depends(resolve_credentials),
+) -> Optional[CachedUser]:
     """
     Get current user if JWT token is provided, otherwise return None.
     Useful for endpoints that can work with or without authentication.
     """
-    if not credentials:
-        return None
-    
-    token = credentials.credentials
-    payload = AuthService.verify_token(token)
-    
-    if not payload or payload.get("type") != "access":
-        return None
-    
-    user_id = int(payload.get("sub"))
-    user = AuthService.get_user_by_id(db, user_id)
-    
-    if user and user.is_active:
-        return user
+    if context.auth_type == "user":
+        return context.user
     
     return None
 
 
 async def get_api_key_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
+    context: AuthContext = Depends(resolve_service_credentials),
 ) -> Optional[ApiKey]:
     """
     Get API key if provided, otherwise return None.
     Useful for endpoints that can work with or without API key authentication.
     """
-    if not credentials:
-        return None
-    
-    api_key = credentials.credentials
-    
-    try:
-        key_obj = ApiKeyService.verify_api_key(db, api_key)
-        return key_obj
-    except Exception:
-        return None
+    return context.api_key
 
 
 async def get_auth_context(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
+    context: AuthContext = Depends(resolve_service_credentials),
 ) -> dict:
     """
     Get authentication context with information about the authentication type.
@@ -80,28 +54,12 @@ async def get_auth_context(
     - user: User object if authenticated with JWT
     - api_key: ApiKey object if authenticated with API key
     """
-    if not credentials:
-        return {"auth_type": "none", "user": None, "api_key": None}
-    
-    token_or_key = credentials.credentials
-    
-    # Try JWT first
-    payload = AuthService.verify_token(token_or_key)
-    if payload and payload.get("type") == "access":
-        user_id = int(payload.get("sub"))
-        user = AuthService.get_user_by_id(db, user_id)
-        if user and user.is_active:
-            return {"auth_type": "user", "user": user, "api_key": None}
-    
-    # Try API key
-    try:
-        api_key = ApiKeyService.verify_api_key(db, token_or_key)
-        if api_key:
-            return {"auth_type": "service", "user": None, "api_key": api_key}
-    except Exception:
-        pass
-    
-    return {"auth_type": "none", "user": None, "api_key": None}
+    auth_type = context.auth_type
+    return {
+        "auth_type": auth_type,
+        "user": context.user if auth_type == "user" else None,
+        "api_key": context.api_key if auth_type == "service" else None,
+    }
 
 
 def require_auth_type(*allowed_types: str):
@@ -1,21 +1,32 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.core.security import REFRESH_TOKEN_TYPE, TOKEN_TYPE_CLAIM
 from app.schemas.user import UserCreate, UserResponse, UserLogin
 from app.schemas.auth import Token, AuthResponse, RefreshTokenRequest
-from app.services.auth_service import AuthService
-from app.middleware.auth_middleware import get_current_active_user
+from app.services.auth_service import AuthService, CachedUser
 from app.models.user import User
+from app.middleware.auth_middleware import get_current_active_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _auth_response(user: User) -> AuthResponse:
+    """
+    Build the signup/login response: the user plus a fresh token pair.
+    """
+    return AuthResponse(
+        user=UserResponse.model_validate(user),
+        tokens=AuthService.generate_tokens(user),
+    )
+
+
 @router.post("/signup", response_model=AuthResponse, status_code=status.HTTP_201_CREATED)
 async def signup(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Register a new user account.
@@ -27,32 +38,15 @@ async def signup(
     Returns the created user and authentication tokens.
     """
     # Create user
-    user = AuthService.create_user(db, user_data)
-    
-    # Generate tokens
-    tokens = AuthService.generate_tokens(user)
+    user = await AuthService.create_user(db, user_data)
     
-    # Prepare response
-    user_dict = {
-        "id": user.id,
-        "email": user.email,
-        "name": user.name,
-        "role": user.role,
-        "is_active": user.is_active,
-        "created_at": user.created_at,
-        "updated_at": user.updated_at,
-    }
-    
-    return {
-        "user": user_dict,
-        "tokens": tokens,
-    }
+    return _auth_response(user)
 
 
 @router.post("/login", response_model=AuthResponse)
 async def login(
     credentials: UserLogin,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Authenticate user and generate JWT tokens.
@@ -63,7 +57,7 @@ async def login(
     Returns authentication tokens on successful login.
     """
     # Authenticate user
-    user = AuthService.authenticate_user(db, credentials.email, credentials.password)
+    user = await AuthService.authenticate_user(db, credentials.email, credentials.password)
     
     if not user:
         raise HTTPException(
@@ -72,30 +66,12 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Generate tokens
-    tokens = AuthService.generate_tokens(user)
-    
-    # Prepare response
-    user_dict = {
-        "id": user.id,
-        "email": user.email,
-        "name": user.name,
-        "role": user.role,
-        "is_active": user.is_active,
-        "created_at": user.created_at,
-        "updated_at": user.updated_at,
-    }
-    
-    return {
-        "user": user_dict,
-        "tokens": tokens,
-    }
+    return _auth_response(user)
 
 
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
     request: RefreshTokenRequest,
-    db: Session = Depends(get_db),
 ):
     """
     Refresh access token using a refresh token.
@@ -107,33 +83,29 @@ async def refresh_token(
     # Verify refresh token
     payload = AuthService.verify_token(request.refresh_token)
     
-    if not payload or payload.get("type") != "refresh":
+    if not payload or payload.get(TOKEN_TYPE_CLAIM) != REFRESH_TOKEN_TYPE:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user
-    user_id = int(payload.get("sub"))
-    user = AuthService.get_user_by_id(db, user_id)
+    # Generate new tokens
+    tokens = AuthService.refresh_tokens(payload)
     
-    if not user or not user.is_active:
+    if not tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found or inactive",
+            detail="Session expired, please log in again",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Generate new tokens
-    tokens = AuthService.generate_tokens(user)
-    
     return tokens
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user),
+    current_user: CachedUser = Depends(get_current_active_user),
 ):
     """
     Get current authenticated user's information.
@@ -145,7 +117,7 @@ async def get_current_user_info(
 
 @router.post("/logout")
 async def logout(
-    current_user: User = Depends(get_current_active_user),
+    current_user: CachedUser = Depends(get_current_active_user),
 ):
     """
     Logout current user.
@@ -1,6 +1,7 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.schemas.api_key import (
@@ -10,22 +11,23 @@ from app.schemas.api_key import (
     ApiKeyUpdate,
     ApiKeyRenew,
 )
-from app.services.auth_service import ApiKeyService
+from app.services.auth_service import ApiKeyService, CachedUser
 from app.middleware.auth_middleware import (
     get_current_active_user,
     verify_api_key_dependency,
 )
-from app.models.user import User
 from app.models.api_key import ApiKey
 
 router = APIRouter(prefix="/keys", tags=["API Keys"])
 
+_api_key_list_adapter = TypeAdapter(List[ApiKeyResponse])
+
 
 @router.post("/create", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
 async def create_api_key(
     key_data: ApiKeyCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Create a new API key for service-to-service authentication.
@@ -39,7 +41,7 @@ async def create_api_key(
     
     Requires user authentication (JWT).
     """
-    api_key, plain_key = ApiKeyService.create_api_key(db, key_data, current_user.id)
+    api_key, plain_key = await ApiKeyService.create_api_key(db, key_data, current_user.id)
     
     # Build response with the plain API key (shown only once)
     response = ApiKeyCreated(
@@ -60,8 +62,8 @@ async def create_api_key(
 
 @router.get("/list", response_model=List[ApiKeyResponse])
 async def list_api_keys(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     List all API keys created by the current user.
@@ -71,15 +73,27 @@ async def list_api_keys(
     
     Requires user authentication (JWT).
     """
-    api_keys = ApiKeyService.get_user_api_keys(db, current_user.id)
-    return api_keys
+    api_keys = await ApiKeyService.get_user_api_keys(db, current_user.id)
+    
+    # Rows come straight from the database, so build the models without
+    # re-validating them and serialize the whole list in one pass
+    keys = [
+        ApiKeyResponse.model_construct(
+            **{field: getattr(api_key, field) for field in ApiKeyResponse.model_fields}
+        )
+        for api_key in api_keys
+    ]
+    return Response(
+        content=_api_key_list_adapter.dump_json(keys),
+        media_type="application/json",
+    )
 
 
 @router.get("/{key_id}", response_model=ApiKeyResponse)
 async def get_api_key(
     key_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get details of a specific API key.
@@ -89,25 +103,15 @@ async def get_api_key(
     Requires user authentication (JWT).
     Only the key owner can view the key details.
     """
-    api_key = db.query(ApiKey).filter(
-        ApiKey.id == key_id,
-        ApiKey.created_by == current_user.id
-    ).first()
-    
-    if not api_key:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="API key not found"
-        )
-    
+    api_key = await ApiKeyService.get_api_key(db, key_id, current_user.id)
     return api_key
 
 
 @router.patch("/{key_id}/revoke", response_model=ApiKeyResponse)
 async def revoke_api_key(
     key_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Revoke (deactivate) an API key.
@@ -118,7 +122,7 @@ async def revoke_api_key(
     
     Requires user authentication (JWT).
     """
-    api_key = ApiKeyService.revoke_api_key(db, key_id, current_user.id)
+    api_key = await ApiKeyService.revoke_api_key(db, key_id, current_user.id)
     return api_key
 
 
@@ -126,8 +130,8 @@ async def revoke_api_key(
 async def renew_api_key(
     key_id: int,
     renew_data: ApiKeyRenew,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Renew an API key by extending its expiration date.
@@ -137,7 +141,7 @@ async def renew_api_key(
     
     Requires user authentication (JWT).
     """
-    api_key = ApiKeyService.renew_api_key(
+    api_key = await ApiKeyService.renew_api_key(
         db, key_id, current_user.id, renew_data.expires_in_days
     )
     return api_key
@@ -146,8 +150,8 @@ async def renew_api_key(
 @router.delete("/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_api_key(
     key_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Permanently delete an API key.
@@ -158,7 +162,7 @@ async def delete_api_key(
     
     Requires user authentication (JWT).
     """
-    ApiKeyService.delete_api_key(db, key_id, current_user.id)
+    await ApiKeyService.delete_api_key(db, key_id, current_user.id)
     return None
 
 
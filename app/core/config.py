@@ -1,5 +1,5 @@
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -14,18 +14,34 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    API_KEY_ENCRYPTION_KEY: str
+    REFRESH_TOKEN_MAX_AGE_DAYS: Optional[int] = None  # Optional limit on refreshing since the last login
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_SIZE: int = 10_000
+    TOKEN_CACHE_TTL_SECONDS: int = 30
+    TOKEN_CACHE_MAX_SIZE: int = 10_000
+    CREDENTIAL_CACHE_TTL_SECONDS: int = 60
+    CREDENTIAL_CACHE_MAX_SIZE: int = 10_000
+    API_KEY_ENCRYPTION_KEY: Optional[str] = None  # No longer used; API keys are hashed
+    API_KEY_PEPPER: str
+    API_KEY_BCRYPT_ROUNDS: int = 4
+    BCRYPT_ROUNDS: int = 10  # Each extra round doubles hashing time
     
     # API Key Settings
     API_KEY_DEFAULT_EXPIRATION_DAYS: int = 90
     API_KEY_PREFIX: str = "sbk_"
+    API_KEY_USAGE_FLUSH_SECONDS: int = 10  # How often last_used_at is written out
     
     # Database
     DATABASE_URL: str = "sqlite:///./securebridge.db"
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 40
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
     
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: Optional[int] = None  # Defaults to one per CPU core
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
@@ -36,9 +52,7 @@ class Settings(BaseSettings):
     # Admin User
     ADMIN_EMAIL: str = "admin@securebridge.com"
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
 settings = Settings()
\ No newline at end of file
@@ -1,50 +1,96 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from app.core.config import settings
 
-# Convert async URL to sync if needed
-database_url = settings.DATABASE_URL.replace("sqlite+aiosqlite", "sqlite").replace("postgresql+asyncpg", "postgresql+psycopg2")
+# Async drivers for each supported backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
 
-# Create sync engine
-engine = create_engine(
-    database_url,
-    echo=settings.DEBUG,
-    connect_args={"check_same_thread": False} if "sqlite" in database_url else {},
-)
+# Convert sync URL to async if needed
+database_url = make_url(settings.DATABASE_URL)
+backend = database_url.get_backend_name()
+if backend in ASYNC_DRIVERS:
+    database_url = database_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+# Create async engine
+if backend == "sqlite":
+    engine = create_async_engine(
+        database_url,
+        echo=settings.DEBUG,
+    )
+else:
+    # Keep a warm pool of server connections so requests don't pay the
+    # connect/handshake cost, and drop stale ones before they are handed out.
+    engine = create_async_engine(
+        database_url,
+        echo=settings.DEBUG,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+def enable_sqlite_foreign_keys(sync_engine: Engine) -> None:
+    """
+    Enforce foreign keys on SQLite, which leaves them off by default.
+    
+    Deleting a user relies on the api_keys ON DELETE CASCADE.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def set_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+if backend == "sqlite":
+    enable_sqlite_foreign_keys(engine.sync_engine)
 
 # Create session factory
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
+SessionLocal = async_sessionmaker(
     bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
     Database session dependency for FastAPI routes.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 async def init_db():
     """
     Initialize database tables.
     """
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
 
 async def close_db():
     """
     Close database connections.
     """
-    engine.dispose()
+    await engine.dispose()
 
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db", "init_db", "close_db"]
+__all__ = [
+    "Base",
+    "engine",
+    "SessionLocal",
+    "get_db",
+    "init_db",
+    "close_db",
+    "enable_sqlite_foreign_keys",
+]
@@ -1,10 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
+import time
 import bcrypt
-from cryptography.fernet import Fernet
+from cachetools import TTLCache
+import orjson
 import secrets
 import base64
+import hashlib
+import hmac
 from app.core.config import settings
 
 
@@ -21,73 +24,138 @@ def hash_password(password: str) -> str:
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
     
-    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
+    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS))
     return hashed.decode('utf-8')
 
 
 # JWT Token operations
+# Claims are kept short since every token is sent, and verified, on each request
+TOKEN_TYPE_CLAIM = "t"
+ACCESS_TOKEN_TYPE = "a"
+REFRESH_TOKEN_TYPE = "r"
+
+# HMAC algorithms supported for signing tokens
+_JWT_HASHES = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+def _b64encode(data: bytes) -> bytes:
+    """Base64url-encode without padding, as JWTs require."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    """Decode unpadded base64url."""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+# The header and key never change, so they are prepared once; each signature
+# starts from a copy of the keyed HMAC instead of re-deriving the key pads
+_jwt_signer = hmac.new(settings.SECRET_KEY.encode(), digestmod=_JWT_HASHES[settings.ALGORITHM])
+_jwt_header = _b64encode(orjson.dumps({"alg": settings.ALGORITHM, "typ": "JWT"}))
+
+
+def _jwt_signature(signing_input: bytes) -> bytes:
+    """Compute the HMAC signature of a JWT's header and claims."""
+    signer = _jwt_signer.copy()
+    signer.update(signing_input)
+    return signer.digest()
+
+
+def _encode_jwt(claims: dict) -> str:
+    """Sign claims into a compact JWT."""
+    signing_input = _jwt_header + b"." + _b64encode(orjson.dumps(claims))
+    signature = _jwt_signature(signing_input)
+    return (signing_input + b"." + _b64encode(signature)).decode()
+
+
+def _decode_jwt(token: str, now: float) -> Optional[dict]:
+    """Verify a compact JWT's signature and expiry and return its claims."""
+    try:
+        header_b64, claims_b64, signature_b64 = token.encode().split(b".")
+        header = orjson.loads(_b64decode(header_b64))
+        if not isinstance(header, dict) or header.get("alg") != settings.ALGORITHM:
+            return None
+        
+        expected = _jwt_signature(header_b64 + b"." + claims_b64)
+        if not hmac.compare_digest(expected, _b64decode(signature_b64)):
+            return None
+        
+        payload = orjson.loads(_b64decode(claims_b64))
+    except ValueError:
+        return None
+    
+    if not isinstance(payload, dict):
+        return None
+    
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= now:
+        return None
+    
+    return payload
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    if not expires_delta:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    expire = int(time.time() + expires_delta.total_seconds())
+    to_encode.update({"exp": expire, TOKEN_TYPE_CLAIM: ACCESS_TOKEN_TYPE})
+    return _encode_jwt(to_encode)
 
 
 def create_refresh_token(data: dict) -> str:
     """Create a JWT refresh token."""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    expire = int(time.time() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+    to_encode.update({"exp": expire, TOKEN_TYPE_CLAIM: REFRESH_TOKEN_TYPE})
+    return _encode_jwt(to_encode)
+
+
+# Decoded payloads keyed by the raw token. A token's payload can't change
+# before it expires, so verified tokens are served from here instead of
+# re-running the signature check. Entries are bounded in number and age;
+# expiry is still checked on every hit.
+_token_cache: TTLCache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
 
 
 def decode_token(token: str) -> Optional[dict]:
     """Decode and verify a JWT token."""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
+    now = time.time()
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > now:
+            return payload
+        _token_cache.pop(token, None)
+    
+    payload = _decode_jwt(token, now)
+    if payload is None:
         return None
+    
+    _token_cache[token] = payload
+    return payload
 
 
 # API Key operations
 class APIKeyManager:
-    """Manager for API key encryption and generation."""
-    
-    def __init__(self):
-        # Generate a Fernet key from the encryption key
-        encryption_key = settings.API_KEY_ENCRYPTION_KEY.encode()[:32].ljust(32, b'0')
-        key = base64.urlsafe_b64encode(encryption_key)
-        self.cipher = Fernet(key)
+    """Manager for API key generation."""
     
     def generate_api_key(self) -> str:
         """Generate a secure random API key."""
         random_string = secrets.token_urlsafe(32)
         return f"{settings.API_KEY_PREFIX}{random_string}"
-    
-    def encrypt_api_key(self, api_key: str) -> str:
-        """Encrypt an API key for storage."""
-        encrypted = self.cipher.encrypt(api_key.encode())
-        return base64.urlsafe_b64encode(encrypted).decode()
-    
-    def decrypt_api_key(self, encrypted_key: str) -> str:
-        """Decrypt an API key from storage."""
-        try:
-            decoded = base64.urlsafe_b64decode(encrypted_key.encode())
-            decrypted = self.cipher.decrypt(decoded)
-            return decrypted.decode()
-        except Exception:
-            return ""
 
 
 api_key_manager = APIKeyManager()
+_api_key_pepper = settings.API_KEY_PEPPER.encode()
 
 
 # Expose API key functions
@@ -96,11 +164,23 @@ def generate_api_key() -> str:
     return api_key_manager.generate_api_key()
 
 
-def encrypt_api_key(api_key: str) -> str:
-    """Encrypt an API key for storage."""
-    return api_key_manager.encrypt_api_key(api_key)
+def hash_api_key(api_key: str) -> str:
+    """Hash an API key for storage."""
+    # Keys carry 256 bits of randomness, so a low bcrypt cost is enough
+    hashed = bcrypt.hashpw(api_key.encode(), bcrypt.gensalt(rounds=settings.API_KEY_BCRYPT_ROUNDS))
+    return hashed.decode()
+
+
+def verify_api_key_hash(api_key: str, hashed_key: str) -> bool:
+    """Verify an API key against its stored hash."""
+    try:
+        return bcrypt.checkpw(api_key.encode(), hashed_key.encode())
+    except ValueError:
+        # Not a bcrypt hash, e.g. a key stored encrypted by an older release
+        return False
 
 
-def decrypt_api_key(encrypted_key: str) -> str:
-    """Decrypt an API key from storage."""
-    return api_key_manager.decrypt_api_key(encrypted_key)
+def api_key_lookup_hash(api_key: str) -> str:
+    """Hash an API key for indexed lookup."""
+    # Keyed with a server-side pepper so a leaked table can't be brute-forced offline
+    return hmac.new(_api_key_pepper, api_key.encode(), hashlib.sha256).hexdigest()
@@ -1,10 +1,33 @@
+import asyncio
+import contextlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_db, close_db
+from app.core.database import SessionLocal, init_db, close_db
 from app.api.routes import api_router
+from app.services.auth_service import ApiKeyService
+
+
+async def flush_api_key_usage():
+    """
+    Write buffered API key usage to the database.
+    """
+    async with SessionLocal() as db:
+        await ApiKeyService.flush_last_used(db)
+
+
+async def flush_api_key_usage_periodically():
+    """
+    Flush buffered API key usage every API_KEY_USAGE_FLUSH_SECONDS.
+    """
+    while True:
+        await asyncio.sleep(settings.API_KEY_USAGE_FLUSH_SECONDS)
+        try:
+            await flush_api_key_usage()
+        except Exception as exc:
+            print(f"⚠️ Failed to flush API key usage: {exc}")
 
 
 @asynccontextmanager
@@ -16,9 +39,14 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting SecureBridge...")
     await init_db()
     print("✅ Database initialized")
+    flush_task = asyncio.create_task(flush_api_key_usage_periodically())
     yield
     # Shutdown
     print("🛑 Shutting down SecureBridge...")
+    flush_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await flush_task
+    await flush_api_key_usage()
     await close_db()
     print("✅ Database connections closed")
 
@@ -66,4 +94,21 @@ async def health_check():
         "status": "healthy",
         "app": settings.APP_NAME,
         "version": settings.API_VERSION,
-    }
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    import os
+    import uvicorn
+    
+    # Production entry point: one worker per core; "auto" picks uvloop and
+    # httptools when installed and falls back to asyncio/h11 elsewhere
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS or os.cpu_count(),
+        loop="auto",
+        http="auto",
+        log_level="info",
+    )
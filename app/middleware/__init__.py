@@ -1,4 +1,7 @@
 from app.middleware.auth_middleware import (
+    AuthContext,
+    resolve_credentials,
+    resolve_service_credentials,
     get_current_user,
     get_current_active_user,
     verify_api_key_dependency,
@@ -6,6 +9,9 @@ from app.middleware.auth_middleware import (
 )
 
 __all__ = [
+    "AuthContext",
+    "resolve_credentials",
+    "resolve_service_credentials",
     "get_current_user",
     "get_current_active_user",
     "verify_api_key_dependency",
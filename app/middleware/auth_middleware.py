@@ -1,36 +1,109 @@
+from dataclasses import dataclass
 from typing import Optional, Union
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.services.auth_service import AuthService, ApiKeyService
-from app.models.user import User
+from app.core.security import ACCESS_TOKEN_TYPE, TOKEN_TYPE_CLAIM
+from app.services.auth_service import AuthService, ApiKeyService, CachedUser
 from app.models.api_key import ApiKey
 
 # Security schemes
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
+@dataclass
+class AuthContext:
+    """
+    Credentials resolved for the current request.
+    """
+    credential: Optional[str] = None
+    payload: Optional[dict] = None
+    user: Optional[CachedUser] = None
+    api_key: Optional[ApiKey] = None
+    api_key_error: Optional[HTTPException] = None
+    
+    @property
+    def auth_type(self) -> str:
+        """
+        "user" for an active JWT user, "service" for an API key, otherwise "none".
+        """
+        if self.user and self.user.is_active:
+            return "user"
+        if self.api_key:
+            return "service"
+        return "none"
+
+
+async def resolve_credentials(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_db),
+) -> AuthContext:
     """
-    Dependency to get the current authenticated user from JWT token.
+    Resolve the bearer credential into a user.
+    
+    Every authentication dependency builds on this one, so FastAPI's per-request
+    dependency cache verifies the token and loads the user at most once. API
+    keys are only checked by resolve_service_credentials.
     """
     if not credentials:
+        return AuthContext()
+    
+    token_or_key = credentials.credentials
+    context = AuthContext(credential=token_or_key)
+    
+    # Try JWT, unless the credential is clearly an API key
+    if not token_or_key.startswith(settings.API_KEY_PREFIX):
+        context.payload = AuthService.verify_token(token_or_key)
+        if context.payload and context.payload.get(TOKEN_TYPE_CLAIM) == ACCESS_TOKEN_TYPE:
+            user_id = int(context.payload.get("sub"))
+            context.user = await AuthService.get_user_by_id(db, user_id)
+    
+    return context
+
+
+async def resolve_service_credentials(
+    context: AuthContext = Depends(resolve_credentials),
+    db: AsyncSession = Depends(get_db),
+) -> AuthContext:
+    """
+    Resolve the bearer credential into a user or API key.
+    
+    Only dependencies that accept service authentication use this, so
+    user-only routes never pay for an API key lookup.
+    """
+    credential = context.credential
+    
+    # Anything shaped like a JWT can't be an API key, so skip the lookup
+    if not credential or context.payload or credential.count(".") == 2:
+        return context
+    
+    # Keep rejections (e.g. expiry) for dependencies that require an API key
+    try:
+        context.api_key = await ApiKeyService.verify_api_key(db, credential)
+    except HTTPException as exc:
+        context.api_key_error = exc
+    
+    return context
+
+
+async def get_current_user(
+    context: AuthContext = Depends(resolve_credentials),
+) -> CachedUser:
+    """
+    Dependency to get the current authenticated user from JWT token.
+    """
+    if not context.credential:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    token = credentials.credentials
-    
     # Verify token
-    payload = AuthService.verify_token(token)
-    if not payload:
+    if not context.payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -38,30 +111,26 @@ async def get_current_user(
         )
     
     # Check token type
-    if payload.get("type") != "access":
+    if context.payload.get(TOKEN_TYPE_CLAIM) != ACCESS_TOKEN_TYPE:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token type",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user_id = int(payload.get("sub"))
-    user = AuthService.get_user_by_id(db, user_id)
-    
-    if not user:
+    if not context.user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    return context.user
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: CachedUser = Depends(get_current_user),
+) -> CachedUser:
     """
     Dependency to get the current active user.
     """
@@ -75,63 +144,53 @@ async def get_current_active_user(
 
 
 async def verify_api_key_dependency(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
+    context: AuthContext = Depends(resolve_service_credentials),
 ) -> ApiKey:
     """
     Dependency to verify API key authentication.
     """
-    if not credentials:
+    if not context.credential:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API key required",
             headers={"WWW-Authenticate": "ApiKey"},
         )
     
-    api_key = credentials.credentials
+    if context.api_key_error:
+        raise context.api_key_error
     
-    # Verify API key
-    key_obj = ApiKeyService.verify_api_key(db, api_key)
-    
-    if not key_obj:
+    if not context.api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key",
             headers={"WWW-Authenticate": "ApiKey"},
         )
     
-    return key_obj
+    return context.api_key
 
 
 async def get_current_user_or_service(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
-) -> Union[User, ApiKey]:
+    context: AuthContext = Depends(resolve_service_credentials),
+) -> Union[CachedUser, ApiKey]:
     """
     Dependency that accepts either JWT token or API key.
     Returns either a User object (for JWT) or ApiKey object (for API key).
     """
-    if not credentials:
+    if not context.credential:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication required",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    token_or_key = credentials.credentials
+    if context.auth_type == "user":
+        return context.user
     
-    # Try JWT first
-    payload = AuthService.verify_token(token_or_key)
-    if payload and payload.get("type") == "access":
-        user_id = int(payload.get("sub"))
-        user = AuthService.get_user_by_id(db, user_id)
-        if user and user.is_active:
-            return user
-    
-    # Try API key
-    api_key = ApiKeyService.verify_api_key(db, token_or_key)
-    if api_key:
-        return api_key
+    if context.auth_type == "service":
+        return context.api_key
+    
+    if context.api_key_error:
+        raise context.api_key_error
     
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -145,7 +204,9 @@ def require_role(required_role: str):
     Dependency factory for role-based access control.
     Usage: Depends(require_role("admin"))
     """
-    async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
+    async def role_checker(
+        current_user: CachedUser = Depends(get_current_active_user),
+    ) -> CachedUser:
         if current_user.role != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
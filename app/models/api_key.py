@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -10,7 +10,8 @@ class ApiKey(Base):
     __tablename__ = "api_keys"
     
     id = Column(Integer, primary_key=True, index=True)
-    key_hash = Column(String, unique=True, index=True, nullable=False)  # Encrypted API key
+    key_hash = Column(String, nullable=False)  # bcrypt hash of the API key
+    key_lookup_hash = Column(String(64), unique=True, index=True, nullable=False)  # Peppered HMAC-SHA256 of the key
     service_name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     permissions = Column(JSON, default=list)  # List of allowed permissions/scopes
@@ -21,10 +22,14 @@ class ApiKey(Base):
     last_used_at = Column(DateTime, nullable=True)
     
     # Foreign key to User
-    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Indexed as the leading column of ix_api_keys_created_by_id below
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
-    # Relationship
-    owner = relationship("User", back_populates="api_keys")
+    # Relationship; never loaded implicitly, use selectinload(ApiKey.owner) when needed
+    owner = relationship("User", back_populates="api_keys", lazy="raise")
+    
+    # Owner-scoped lookups filter on both columns
+    __table_args__ = (Index("ix_api_keys_created_by_id", "created_by", "id"),)
     
     def __repr__(self):
         return f"<ApiKey {self.service_name}>"
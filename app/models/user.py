@@ -18,8 +18,15 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationship to API keys
-    api_keys = relationship("ApiKey", back_populates="owner", cascade="all, delete-orphan")
+    # Relationship to API keys; never loaded implicitly, use selectinload(User.api_keys).
+    # Deleting a user leaves removing its keys to the database's ON DELETE CASCADE.
+    api_keys = relationship(
+        "ApiKey",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+        passive_deletes=True,
+    )
     
     def __repr__(self):
         return f"<User {self.email}>"
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -35,16 +35,14 @@ class ApiKeyResponse(BaseModel):
     last_used_at: Optional[datetime]
     created_by: int
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ApiKeyCreated(ApiKeyResponse):
     """Schema for newly created API key (includes the actual key - shown only once)."""
     api_key: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ApiKeyRenew(BaseModel):
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
 
+from app.schemas.user import UserResponse
+
 
 class Token(BaseModel):
     """Schema for JWT token response."""
@@ -24,7 +26,7 @@ class RefreshTokenRequest(BaseModel):
 
 class AuthResponse(BaseModel):
     """Schema for authentication response."""
-    user: dict
+    user: UserResponse
     tokens: Token
 
 
@@ -36,5 +38,4 @@ class ActivityLog(BaseModel):
     user_agent: Optional[str]
     success: bool
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
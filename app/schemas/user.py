@@ -1,11 +1,28 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+import re
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field
+from typing import Annotated, Optional, List
 from datetime import datetime
 
 
+# Syntax-only check: a local part, an "@" and a dotted domain
+_EMAIL_RE = re.compile(r"^[^@\s]+@([^@\s]+\.[^@\s]+)$")
+
+
+def _check_email(value: str) -> str:
+    """Validate an email address and lowercase its domain."""
+    match = _EMAIL_RE.match(value)
+    if not match:
+        raise ValueError("value is not a valid email address")
+    # Domains are case-insensitive; the local part is left as given
+    return value[:match.start(1)] + match.group(1).lower()
+
+
+Email = Annotated[str, AfterValidator(_check_email)]
+
+
 class UserBase(BaseModel):
     """Base user schema."""
-    email: EmailStr
+    email: Email
     name: str = Field(..., min_length=1, max_length=100)
 
 
@@ -16,14 +33,14 @@ class UserCreate(UserBase):
 
 class UserLogin(BaseModel):
     """Schema for user login."""
-    email: EmailStr
+    email: Email
     password: str
 
 
 class UserUpdate(BaseModel):
     """Schema for updating user information."""
     name: Optional[str] = Field(None, min_length=1, max_length=100)
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
 
 
 class UserResponse(UserBase):
@@ -34,16 +51,14 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserWithKeys(UserResponse):
     """Schema for user with their API keys."""
     api_keys: List["ApiKeyResponse"] = []
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Forward reference for circular import
@@ -1,7 +1,16 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Callable, NamedTuple, Optional
+from cachetools import TTLCache
+from sqlalchemy import bindparam, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 from app.models.user import User
 from app.models.api_key import ApiKey
@@ -14,30 +23,99 @@ from app.core.security import (
     create_refresh_token,
     decode_token,
     generate_api_key,
-    encrypt_api_key,
-    decrypt_api_key,
+    hash_api_key,
+    verify_api_key_hash,
+    api_key_lookup_hash,
 )
 from app.core.config import settings
 
 
+# Digests of credentials that recently passed a bcrypt check. Each digest
+# covers the stored hash as well as the plain credential, so changing a
+# password or key naturally misses the cache. The digest key is random per
+# process; nothing in the cache is useful outside it.
+_verified_credentials: TTLCache = TTLCache(
+    maxsize=settings.CREDENTIAL_CACHE_MAX_SIZE,
+    ttl=settings.CREDENTIAL_CACHE_TTL_SECONDS,
+)
+_credential_cache_key = secrets.token_bytes(32)
+
+
+def _credential_digest(plain: str, hashed: str) -> bytes:
+    """Digest identifying a plain credential checked against a stored hash."""
+    return hmac.new(_credential_cache_key, f"{hashed}\0{plain}".encode(), hashlib.sha256).digest()
+
+
+async def _verify_cached(
+    verify: Callable[[str, str], bool],
+    plain: str,
+    hashed: str,
+    threaded: bool = False,
+) -> bool:
+    """
+    Run a hash verification, skipping it if the same credential recently passed.
+    
+    Only successes are cached, so a wrong guess always pays the full cost.
+    """
+    digest = _credential_digest(plain, hashed)
+    if digest in _verified_credentials:
+        return True
+    
+    if threaded:
+        verified = await run_in_threadpool(verify, plain, hashed)
+    else:
+        verified = verify(plain, hashed)
+    
+    if verified:
+        _verified_credentials[digest] = True
+    return verified
+
+
+def clear_credential_cache() -> None:
+    """
+    Drop all cached credential verifications.
+    """
+    _verified_credentials.clear()
+
+
+class CachedUser(NamedTuple):
+    """Detached snapshot of a user row, safe to share across sessions."""
+    id: int
+    email: str
+    name: str
+    role: str
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+
 class AuthService:
     """Service for handling authentication operations."""
     
+    # Users resolved from JWTs, keyed by user ID
+    _user_cache: TTLCache = TTLCache(
+        maxsize=settings.USER_CACHE_MAX_SIZE,
+        ttl=settings.USER_CACHE_TTL_SECONDS,
+    )
+    
     @staticmethod
-    def create_user(db: Session, user_data: UserCreate) -> User:
+    async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
         """
         Create a new user with hashed password.
         """
-        # Check if user already exists
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
-        if existing_user:
+        # Check if user already exists while the password hashes; bcrypt is
+        # CPU-bound and runs on a worker thread to keep the event loop free
+        email_taken, hashed_pwd = await asyncio.gather(
+            db.scalar(select(exists().where(User.email == user_data.email))),
+            run_in_threadpool(hash_password, user_data.password),
+        )
+        if email_taken:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
         # Create new user
-        hashed_pwd = hash_password(user_data.password)
         new_user = User(
             email=user_data.email,
             name=user_data.name,
@@ -45,17 +123,16 @@ class AuthService:
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
         
         return new_user
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
         """
         Authenticate a user with email and password.
         """
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         
         if not user:
             return None
@@ -66,24 +143,49 @@ class AuthService:
                 detail="User account is inactive"
             )
         
-        if not verify_password(password, user.hashed_password):
+        if not await _verify_cached(verify_password, password, user.hashed_password, threaded=True):
             return None
         
         return user
     
     @staticmethod
-    def generate_tokens(user: User) -> dict:
+    def generate_tokens(user: User | CachedUser) -> dict:
         """
         Generate access and refresh tokens for a user.
         """
-        token_data = {
-            "sub": str(user.id),
-            "email": user.email,
-            "role": user.role,
-        }
+        return AuthService._issue_tokens(user.id, int(time.time()))
+    
+    @staticmethod
+    def refresh_tokens(payload: dict) -> Optional[dict]:
+        """
+        Generate new tokens from a verified refresh token payload.
         
-        access_token = create_access_token(token_data)
-        refresh_token = create_refresh_token({"sub": str(user.id)})
+        Everything needed is carried in the refresh token, so no database lookup
+        is made; the user is still checked when the new access token is used.
+        Returns None if REFRESH_TOKEN_MAX_AGE_DAYS is set and the original login
+        is older than that.
+        """
+        auth_time = payload.get("auth_time", 0)
+        if settings.REFRESH_TOKEN_MAX_AGE_DAYS is not None:
+            max_age = timedelta(days=settings.REFRESH_TOKEN_MAX_AGE_DAYS).total_seconds()
+            if time.time() - auth_time > max_age:
+                return None
+        
+        return AuthService._issue_tokens(int(payload.get("sub")), auth_time)
+    
+    @staticmethod
+    def _issue_tokens(user_id: int, auth_time: int) -> dict:
+        """
+        Build an access/refresh token pair.
+        
+        auth_time is the time of the original login and is carried across
+        refreshes, so a session can't be extended indefinitely.
+        """
+        access_token = create_access_token({"sub": str(user_id)})
+        refresh_token = create_refresh_token({
+            "sub": str(user_id),
+            "auth_time": auth_time,
+        })
         
         return {
             "access_token": access_token,
@@ -99,39 +201,92 @@ class AuthService:
         return decode_token(token)
     
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[CachedUser]:
         """
         Get a user by their ID.
+        
+        Results are cached for a short time, so the returned snapshot may lag
+        behind the database by up to USER_CACHE_TTL_SECONDS.
+        """
+        cached = AuthService._user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        # Select just the snapshot's columns, skipping the password hash and
+        # the cost of building an ORM instance
+        row = (await db.execute(
+            select(*(getattr(User, field) for field in CachedUser._fields))
+            .where(User.id == user_id)
+        )).first()
+        if not row:
+            return None
+        
+        cached = CachedUser(*row)
+        AuthService._user_cache[user_id] = cached
+        
+        return cached
+    
+    @staticmethod
+    async def get_user_with_api_keys(db: AsyncSession, user_id: int) -> Optional[User]:
+        """
+        Get a user by their ID along with their API keys.
+        
+        The keys are fetched in one extra batched query, ready for UserWithKeys.
         """
-        return db.query(User).filter(User.id == user_id).first()
+        return await db.scalar(
+            select(User).options(selectinload(User.api_keys)).where(User.id == user_id)
+        )
     
     @staticmethod
-    def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    def invalidate_user(user_id: int) -> None:
+        """
+        Drop a user from the cache after it has been modified.
+        
+        Any code that updates or deactivates a user should call this; no such
+        path exists yet, so until then changes show within USER_CACHE_TTL_SECONDS.
+        """
+        AuthService._user_cache.pop(user_id, None)
+    
+    @staticmethod
+    def clear_user_cache() -> None:
+        """
+        Drop all cached users.
+        """
+        AuthService._user_cache.clear()
+    
+    @staticmethod
+    async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """
         Get a user by their email.
         """
-        return db.query(User).filter(User.email == email).first()
+        return await db.scalar(select(User).where(User.email == email))
 
 
 class ApiKeyService:
     """Service for handling API key operations."""
     
+    # Pending last_used_at values, keyed by API key ID, written out in batches
+    # by flush_last_used instead of committing on every verification
+    _last_used_buffer: dict[int, datetime] = {}
+    
     @staticmethod
-    def create_api_key(db: Session, key_data: ApiKeyCreate, user_id: int) -> tuple[ApiKey, str]:
+    async def create_api_key(db: AsyncSession, key_data: ApiKeyCreate, user_id: int) -> tuple[ApiKey, str]:
         """
         Create a new API key for a user.
         Returns the ApiKey model and the plain text API key (shown only once).
         """
         # Generate API key
         plain_key = generate_api_key()
-        encrypted_key = encrypt_api_key(plain_key)
+        hashed_key = hash_api_key(plain_key)
+        lookup_hash = api_key_lookup_hash(plain_key)
         
         # Calculate expiration date
         expires_at = datetime.utcnow() + timedelta(days=key_data.expires_in_days or 90)
         
         # Create API key record
         api_key = ApiKey(
-            key_hash=encrypted_key,
+            key_hash=hashed_key,
+            key_lookup_hash=lookup_hash,
             service_name=key_data.service_name,
             description=key_data.description,
             permissions=key_data.permissions,
@@ -140,110 +295,128 @@ class ApiKeyService:
         )
         
         db.add(api_key)
-        db.commit()
-        db.refresh(api_key)
+        await db.commit()
         
         return api_key, plain_key
     
     @staticmethod
-    def verify_api_key(db: Session, plain_key: str) -> Optional[ApiKey]:
+    async def verify_api_key(db: AsyncSession, plain_key: str) -> Optional[ApiKey]:
         """
         Verify an API key and return the associated ApiKey object.
         """
-        # Get all active API keys
-        api_keys = db.query(ApiKey).filter(ApiKey.is_active == True).all()
-        
-        # Try to match the plain key with encrypted keys
-        for api_key in api_keys:
-            try:
-                decrypted = decrypt_api_key(api_key.key_hash)
-                if decrypted == plain_key:
-                    # Check if key is expired
-                    if api_key.expires_at < datetime.utcnow():
-                        raise HTTPException(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            detail="API key has expired"
-                        )
-                    
-                    # Update last used timestamp
-                    api_key.last_used_at = datetime.utcnow()
-                    db.commit()
-                    
-                    return api_key
-            except Exception:
-                continue
-        
-        return None
-    
-    @staticmethod
-    def get_user_api_keys(db: Session, user_id: int) -> list[ApiKey]:
+        api_key = await db.scalar(
+            select(ApiKey).where(
+                ApiKey.key_lookup_hash == api_key_lookup_hash(plain_key),
+                ApiKey.is_active == True
+            )
+        )
+        
+        if not api_key or not await _verify_cached(verify_api_key_hash, plain_key, api_key.key_hash):
+            return None
+        
+        # Check if key is expired
+        now = datetime.utcnow()
+        if api_key.expires_at < now:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="API key has expired"
+            )
+        
+        # Record last used timestamp; written out by flush_last_used
+        ApiKeyService._last_used_buffer[api_key.id] = now
+        
+        return api_key
+    
+    @staticmethod
+    async def flush_last_used(db: AsyncSession) -> None:
+        """
+        Write buffered last_used_at timestamps in a single batched UPDATE.
+        """
+        if not ApiKeyService._last_used_buffer:
+            return
+        
+        pending = ApiKeyService._last_used_buffer
+        ApiKeyService._last_used_buffer = {}
+        
+        table = ApiKey.__table__
+        try:
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("key_id"))
+                .values(last_used_at=bindparam("used_at")),
+                [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()],
+            )
+            await db.commit()
+        except BaseException:
+            # Put the batch back for the next flush; anything recorded since is newer
+            ApiKeyService._last_used_buffer = {**pending, **ApiKeyService._last_used_buffer}
+            raise
+    
+    @staticmethod
+    def clear_last_used_buffer() -> None:
+        """
+        Drop buffered last_used_at timestamps without writing them.
+        """
+        ApiKeyService._last_used_buffer.clear()
+    
+    @staticmethod
+    async def get_user_api_keys(db: AsyncSession, user_id: int) -> list[ApiKey]:
         """
         Get all API keys created by a user.
         """
-        return db.query(ApiKey).filter(ApiKey.created_by == user_id).all()
+        result = await db.scalars(select(ApiKey).where(ApiKey.created_by == user_id))
+        return list(result)
     
     @staticmethod
-    def revoke_api_key(db: Session, key_id: int, user_id: int) -> ApiKey:
+    async def get_api_key(db: AsyncSession, key_id: int, user_id: int) -> ApiKey:
         """
-        Revoke (deactivate) an API key.
+        Get an API key owned by a user.
         """
-        api_key = db.query(ApiKey).filter(
-            ApiKey.id == key_id,
-            ApiKey.created_by == user_id
-        ).first()
+        # Primary-key lookup goes through the session's identity map first
+        api_key = await db.get(ApiKey, key_id)
         
-        if not api_key:
+        if not api_key or api_key.created_by != user_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="API key not found"
             )
         
+        return api_key
+    
+    @staticmethod
+    async def revoke_api_key(db: AsyncSession, key_id: int, user_id: int) -> ApiKey:
+        """
+        Revoke (deactivate) an API key.
+        """
+        api_key = await ApiKeyService.get_api_key(db, key_id, user_id)
+        
         api_key.is_active = False
-        db.commit()
-        db.refresh(api_key)
+        await db.commit()
         
         return api_key
     
     @staticmethod
-    def renew_api_key(db: Session, key_id: int, user_id: int, expires_in_days: int) -> ApiKey:
+    async def renew_api_key(db: AsyncSession, key_id: int, user_id: int, expires_in_days: int) -> ApiKey:
         """
         Renew an API key by extending its expiration date.
         """
-        api_key = db.query(ApiKey).filter(
-            ApiKey.id == key_id,
-            ApiKey.created_by == user_id
-        ).first()
-        
-        if not api_key:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="API key not found"
-            )
+        api_key = await ApiKeyService.get_api_key(db, key_id, user_id)
         
         # Extend expiration
-        api_key.expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
-        api_key.updated_at = datetime.utcnow()
+        now = datetime.utcnow()
+        api_key.expires_at = now + timedelta(days=expires_in_days)
+        api_key.updated_at = now
         
-        db.commit()
-        db.refresh(api_key)
+        await db.commit()
         
         return api_key
     
     @staticmethod
-    def delete_api_key(db: Session, key_id: int, user_id: int) -> None:
+    async def delete_api_key(db: AsyncSession, key_id: int, user_id: int) -> None:
         """
         Permanently delete an API key.
         """
-        api_key = db.query(ApiKey).filter(
-            ApiKey.id == key_id,
-            ApiKey.created_by == user_id
-        ).first()
-        
-        if not api_key:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="API key not found"
-            )
+        api_key = await ApiKeyService.get_api_key(db, key_id, user_id)
         
-        db.delete(api_key)
-        db.commit()
+        await db.delete(api_key)
+        await db.commit()
@@ -1,19 +1,14 @@
 #!/usr/bin/env python3
 """
 Script to generate secure keys for SecureBridge configuration.
-Run this to generate SECRET_KEY and API_KEY_ENCRYPTION_KEY.
+Run this to generate SECRET_KEY and API_KEY_PEPPER.
 """
 import secrets
-from cryptography.fernet import Fernet
 
 def generate_secret_key(length: int = 32) -> str:
     """Generate a secure random secret key."""
     return secrets.token_hex(length)
 
-def generate_encryption_key() -> str:
-    """Generate a Fernet encryption key."""
-    return Fernet.generate_key().decode()
-
 if __name__ == "__main__":
     print("=" * 60)
     print("SecureBridge - Security Keys Generator")
@@ -21,10 +16,10 @@ if __name__ == "__main__":
     print("\nGenerating secure keys for your .env file...\n")
     
     secret_key = generate_secret_key()
-    encryption_key = generate_encryption_key()
+    api_key_pepper = generate_secret_key()
     
     print(f"SECRET_KEY={secret_key}")
-    print(f"API_KEY_ENCRYPTION_KEY={encryption_key}")
+    print(f"API_KEY_PEPPER={api_key_pepper}")
     
     print("\n" + "=" * 60)
     print("⚠️  IMPORTANT: Copy these keys to your .env file")
@@ -1,34 +1,62 @@
+import os
+
+# Test database setup; one file per pytest-xdist worker so parallel runs don't
+# collide. Set before the app is imported so its own engine, used by the
+# lifespan, points at the same file.
+SQLALCHEMY_TEST_DATABASE_URL = f"sqlite:///./test_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_TEST_DATABASE_URL
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.config import settings
+from app.core.database import Base, enable_sqlite_foreign_keys, get_db
+from app.core.security import hash_password
+from app.models.user import User
+from app.services.auth_service import ApiKeyService, AuthService, clear_credential_cache
 
-# Test database setup
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test.db"
+# Sync engine for creating and dropping tables around each test
+sync_engine = create_engine(SQLALCHEMY_TEST_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_TEST_DATABASE_URL, connect_args={"check_same_thread": False}
+# Async engine used by the app; NullPool since each TestClient runs its own event loop
+engine = create_async_engine(
+    SQLALCHEMY_TEST_DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1),
+    poolclass=NullPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+enable_sqlite_foreign_keys(sync_engine)
+enable_sqlite_foreign_keys(engine.sync_engine)
+TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
+# Shared by every user_factory user, so setup doesn't pay for a bcrypt hash per user
+FIXED_PASSWORD = "password123"
+_FIXED_HASH = hash_password(FIXED_PASSWORD)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_password_hashing(monkeypatch):
+    """Use the minimum bcrypt cost so signups don't dominate test time."""
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
 
 
 @pytest.fixture(scope="function")
 def test_db():
     """Create test database and tables."""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=sync_engine)
     yield
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=sync_engine)
+    AuthService.clear_user_cache()
+    ApiKeyService.clear_last_used_buffer()
+    clear_credential_cache()
 
 
 @pytest.fixture(scope="function")
@@ -40,6 +68,19 @@ def client(test_db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def user_factory(test_db):
+    """Insert users directly, skipping the signup endpoint; all share FIXED_PASSWORD."""
+    def make_user(email: str, name: str = "Test User") -> User:
+        with Session(sync_engine, expire_on_commit=False) as db:
+            user = User(email=email, name=name, hashed_password=_FIXED_HASH)
+            db.add(user)
+            db.commit()
+        return user
+    
+    return make_user
+
+
 @pytest.fixture
 def test_user_data():
     """Sample user data for testing."""
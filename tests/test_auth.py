@@ -1,5 +1,17 @@
+import time
+from datetime import timedelta
+
 import pytest
 from fastapi import status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import create_refresh_token
+from app.models.user import User
+from app.services import auth_service
+from app.services.auth_service import AuthService
+from tests.conftest import sync_engine
 
 
 def test_signup_success(client, test_user_data):
@@ -17,6 +29,22 @@ def test_signup_success(client, test_user_data):
     assert "refresh_token" in data["tokens"]
 
 
+def test_signup_invalid_email(client, test_user_data):
+    """Test signup with a malformed email address."""
+    test_user_data["email"] = "not-an-email"
+    response = client.post("/api/v1/auth/signup", json=test_user_data)
+    
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_signup_lowercases_email_domain(client, test_user_data):
+    """Test that the email domain is normalized to lowercase."""
+    test_user_data["email"] = "Test@Example.COM"
+    response = client.post("/api/v1/auth/signup", json=test_user_data)
+    
+    assert response.json()["user"]["email"] == "Test@example.com"
+
+
 def test_signup_duplicate_email(client, test_user_data):
     """Test signup with duplicate email."""
     # First signup
@@ -64,6 +92,24 @@ def test_login_wrong_password(client, test_user_data):
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+def test_login_repeat_skips_password_check(client, test_user_data, monkeypatch):
+    """Test that a repeat login with the same password is served from the cache."""
+    client.post("/api/v1/auth/signup", json=test_user_data)
+    login_data = {
+        "email": test_user_data["email"],
+        "password": test_user_data["password"],
+    }
+    client.post("/api/v1/auth/login", json=login_data)
+    
+    def fail(*args):
+        raise AssertionError("password was re-verified")
+    
+    monkeypatch.setattr(auth_service, "verify_password", fail)
+    response = client.post("/api/v1/auth/login", json=login_data)
+    
+    assert response.status_code == status.HTTP_200_OK
+
+
 def test_login_nonexistent_user(client):
     """Test login with non-existent user."""
     login_data = {
@@ -120,6 +166,65 @@ def test_refresh_token(client, test_user_data):
     assert "refresh_token" in data
 
 
+def test_refresh_token_rejects_access_token(client, test_user_data):
+    """Test that an access token cannot be used as a refresh token."""
+    signup_response = client.post("/api/v1/auth/signup", json=test_user_data)
+    access_token = signup_response.json()["tokens"]["access_token"]
+    
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": access_token}
+    )
+    
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_refresh_token_session_too_old(client, monkeypatch):
+    """Test that refreshing stops once the original login is too old."""
+    monkeypatch.setattr(settings, "REFRESH_TOKEN_MAX_AGE_DAYS", 30)
+    stale_login = int(time.time()) - timedelta(days=365).total_seconds()
+    refresh_token = create_refresh_token({"sub": "1", "auth_time": stale_login})
+    
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": refresh_token}
+    )
+    
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_refresh_token_without_max_age(client):
+    """Test that refreshing is unlimited when no max age is configured."""
+    stale_login = int(time.time()) - timedelta(days=365).total_seconds()
+    refresh_token = create_refresh_token({"sub": "1", "auth_time": stale_login})
+    
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": refresh_token}
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_invalidate_user_drops_cached_user(client, user_factory):
+    """Test that changes to a cached user only show after it is invalidated."""
+    user = user_factory("user@example.com")
+    headers = {"Authorization": f"Bearer {AuthService.generate_tokens(user)['access_token']}"}
+    
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == status.HTTP_200_OK
+    
+    with Session(sync_engine) as db:
+        db.execute(update(User).where(User.id == user.id).values(is_active=False))
+        db.commit()
+    
+    # Still served from the user cache
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == status.HTTP_200_OK
+    
+    AuthService.invalidate_user(user.id)
+    
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == status.HTTP_403_FORBIDDEN
+
+
 def test_logout(client, test_user_data):
     """Test logout endpoint."""
     # Signup and get token
@@ -1,5 +1,17 @@
+import asyncio
+from datetime import datetime
+
 import pytest
 from fastapi import status
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.api_key import ApiKey
+from app.models.user import User
+from app.schemas.user import UserWithKeys
+from app.services.auth_service import ApiKeyService, AuthService
+from tests.conftest import TestingSessionLocal, sync_engine
 
 
 def test_create_api_key_success(client, test_user_data, test_api_key_data):
@@ -198,11 +210,10 @@ def test_verify_api_key(client, test_user_data, test_api_key_data):
     assert data["permissions"] == test_api_key_data["permissions"]
 
 
-def test_api_key_access_other_user_key(client, test_user_data, test_api_key_data):
+def test_api_key_access_other_user_key(client, user_factory, test_api_key_data):
     """Test that users cannot access other users' API keys."""
     # Create first user and API key
-    signup_response1 = client.post("/api/v1/auth/signup", json=test_user_data)
-    token1 = signup_response1.json()["tokens"]["access_token"]
+    token1 = AuthService.generate_tokens(user_factory("user1@example.com"))["access_token"]
     
     create_response = client.post(
         "/api/v1/keys/create",
@@ -212,13 +223,7 @@ def test_api_key_access_other_user_key(client, test_user_data, test_api_key_data
     key_id = create_response.json()["id"]
     
     # Create second user
-    test_user_data2 = {
-        "email": "user2@example.com",
-        "name": "User Two",
-        "password": "password123",
-    }
-    signup_response2 = client.post("/api/v1/auth/signup", json=test_user_data2)
-    token2 = signup_response2.json()["tokens"]["access_token"]
+    token2 = AuthService.generate_tokens(user_factory("user2@example.com"))["access_token"]
     
     # Try to access first user's API key with second user's token
     response = client.get(
@@ -227,3 +232,152 @@ def test_api_key_access_other_user_key(client, test_user_data, test_api_key_data
     )
     
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_verify_api_key_rejects_jwt(client, user_factory):
+    """Test that a user JWT is not accepted as an API key."""
+    token = AuthService.generate_tokens(user_factory("user@example.com"))["access_token"]
+    
+    response = client.get(
+        "/api/v1/keys/verify/test",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+
+def test_user_route_ignores_api_key(client, user_factory, test_api_key_data):
+    """Test that user-only routes reject API keys without verifying them."""
+    token = AuthService.generate_tokens(user_factory("user@example.com"))["access_token"]
+    
+    create_response = client.post(
+        "/api/v1/keys/create",
+        json=test_api_key_data,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    api_key = create_response.json()["api_key"]
+    
+    response = client.get(
+        "/api/v1/auth/me",
+        headers={"Authorization": f"Bearer {api_key}"}
+    )
+    
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert not ApiKeyService._last_used_buffer
+
+def test_verify_revoked_api_key(client, test_user_data, test_api_key_data):
+    """Test that a revoked API key is rejected."""
+    signup_response = client.post("/api/v1/auth/signup", json=test_user_data)
+    token = signup_response.json()["tokens"]["access_token"]
+    
+    create_response = client.post(
+        "/api/v1/keys/create",
+        json=test_api_key_data,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    key_id = create_response.json()["id"]
+    api_key = create_response.json()["api_key"]
+    
+    client.patch(
+        f"/api/v1/keys/{key_id}/revoke",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = client.get(
+        "/api/v1/keys/verify/test",
+        headers={"Authorization": f"Bearer {api_key}"}
+    )
+    
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_user_with_api_keys(client, test_user_data, test_api_key_data):
+    """Test that a user's API keys are loaded along with the user."""
+    signup_response = client.post("/api/v1/auth/signup", json=test_user_data)
+    user_id = signup_response.json()["user"]["id"]
+    token = signup_response.json()["tokens"]["access_token"]
+    
+    client.post(
+        "/api/v1/keys/create",
+        json=test_api_key_data,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    async def load():
+        async with TestingSessionLocal() as db:
+            user = await AuthService.get_user_with_api_keys(db, user_id)
+            return UserWithKeys.model_validate(user)
+    
+    user = asyncio.run(load())
+    
+    assert len(user.api_keys) == 1
+    assert user.api_keys[0].service_name == test_api_key_data["service_name"]
+
+
+def test_verify_api_key_records_last_used(client, test_user_data, test_api_key_data):
+    """Test that API key usage is written out when the buffer is flushed."""
+    signup_response = client.post("/api/v1/auth/signup", json=test_user_data)
+    token = signup_response.json()["tokens"]["access_token"]
+    
+    create_response = client.post(
+        "/api/v1/keys/create",
+        json=test_api_key_data,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    key_id = create_response.json()["id"]
+    api_key = create_response.json()["api_key"]
+    
+    client.get(
+        "/api/v1/keys/verify/test",
+        headers={"Authorization": f"Bearer {api_key}"}
+    )
+    
+    async def flush():
+        async with TestingSessionLocal() as db:
+            await ApiKeyService.flush_last_used(db)
+    
+    asyncio.run(flush())
+    
+    response = client.get(
+        f"/api/v1/keys/{key_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.json()["last_used_at"] is not None
+
+
+def test_delete_user_deletes_api_keys(client, user_factory, test_api_key_data):
+    """Test that deleting a user also deletes their API keys."""
+    user = user_factory("user@example.com")
+    token = AuthService.generate_tokens(user)["access_token"]
+    
+    client.post(
+        "/api/v1/keys/create",
+        json=test_api_key_data,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    with Session(sync_engine) as db:
+        db.delete(db.get(User, user.id))
+        db.commit()
+        
+        assert db.scalar(select(func.count()).select_from(ApiKey)) == 0
+
+
+def test_flush_last_used_keeps_buffer_on_failure(test_db):
+    """Test that a failed flush puts its timestamps back without clobbering newer ones."""
+    older = datetime(2025, 1, 1)
+    newer = datetime(2025, 1, 2)
+    ApiKeyService._last_used_buffer.update({1: older, 2: older})
+    
+    class FailingSession:
+        async def execute(self, *args):
+            # Key 2 is used again while the write is in flight
+            ApiKeyService._last_used_buffer[2] = newer
+            raise OperationalError("UPDATE", {}, Exception("database is locked"))
+    
+    with pytest.raises(OperationalError):
+        asyncio.run(ApiKeyService.flush_last_used(FailingSession()))
+    
+    assert ApiKeyService._last_used_buffer == {1: older, 2: newer}
@@ -0,0 +1,70 @@
+import base64
+from datetime import timedelta
+
+from app.core import security
+from app.core.security import (
+    create_access_token,
+    decode_token,
+    hash_api_key,
+    verify_api_key_hash,
+)
+
+
+def test_decode_token_roundtrip():
+    """Test that a freshly created access token decodes to its claims."""
+    token = create_access_token({"sub": "42"})
+
+    payload = decode_token(token)
+
+    assert payload is not None
+    assert payload["sub"] == "42"
+
+
+def test_decode_token_is_cached():
+    """Test that verified tokens are served from the token cache."""
+    token = create_access_token({"sub": "42"})
+
+    first = decode_token(token)
+
+    assert token in security._token_cache
+    assert decode_token(token) is first
+
+
+def test_decode_token_invalid():
+    """Test that tampered or malformed tokens are rejected and not cached."""
+    token = create_access_token({"sub": "42"})
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+
+    assert decode_token(tampered) is None
+    assert decode_token("invalid.token.here") is None
+    assert tampered not in security._token_cache
+
+
+def test_decode_token_expired():
+    """Test that expired tokens are rejected."""
+    token = create_access_token({"sub": "42"}, expires_delta=timedelta(seconds=-1))
+
+    assert decode_token(token) is None
+
+
+def test_hash_api_key_verifies():
+    """Test that hashed API keys verify against the original key only."""
+    hashed = hash_api_key("sbk_example")
+
+    assert hashed.startswith("$2b$")
+    assert verify_api_key_hash("sbk_example", hashed)
+    assert not verify_api_key_hash("sbk_other", hashed)
+
+
+def test_verify_api_key_hash_rejects_non_bcrypt():
+    """Test that values that aren't bcrypt hashes never verify."""
+    assert not verify_api_key_hash("sbk_example", "gAAAAABexample")
+
+
+def test_decode_token_rejects_unsigned():
+    """Test that tokens declaring the "none" algorithm are rejected."""
+    token = create_access_token({"sub": "42"})
+    _, claims, _ = token.split(".")
+    header = base64.urlsafe_b64encode(b'{"alg":"none","typ":"JWT"}').rstrip(b"=").decode()
+
+    assert decode_token(f"{header}.{claims}.") is None